@@ -1,46 +1,134 @@
 #!/usr/bin/env python3
 # log2telegram.py
-# Version: 0.4.3
+# Version: 0.5.0
 # Author: drhdev
 # License: GPLv3
 #
 # Description:
-# This script checks the 'rclone_backup_to_onedrive.log' file for any FINAL_STATUS entries
-# and sends only the single most recently timestamped FINAL_STATUS entry as a Telegram message.
-# It no longer tracks or remembers its last read position or inode; it simply reads the entire
-# log file every time it is run, finds the newest FINAL_STATUS by timestamp, and sends it.
+# This script checks the 'rclone_backup_to_onedrive.log' file for FINAL_STATUS entries
+# and sends them as Telegram messages. It remembers the last read position (and the
+# file's inode, so log rotation is detected) in a small state file; on each run it maps
+# only the bytes appended since the previous run into memory and scans them for
+# FINAL_STATUS, instead of reading every line of the log into Python.
 
 import os
 import sys
 import json
 import logging
-import requests
+import mmap
 import argparse
 import re
+import struct
 import time
-from dotenv import load_dotenv
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
 
-# Load environment variables from .env if present
-load_dotenv()
+# Load environment variables from .env if present. Importing dotenv costs
+# startup time, so only pay for it when there is actually a file to load.
+if os.path.exists('.env'):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Configuration
 LOG_FILE_PATH = "rclone_backup_to_onedrive.log"  # Path to your log file
+STATE_FILE_PATH = "log2telegram.state"  # Remembers the last read position in the log file
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
 
-# Validate Telegram credentials
+# Validate Telegram credentials before deriving anything from them
 if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
     print("ERROR: TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set as environment variables.")
     sys.exit(1)
 
+TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+
+# Shared HTTPS session, created lazily on the first send. Importing requests
+# (which pulls in urllib3, charset_normalizer, idna and certifi) dominates the
+# interpreter cold start, so runs that find nothing to send never pay for it.
+_SESSION = None
+
+def _get_session():
+    """
+    Returns the shared requests.Session, creating it on first use. The session
+    reuses one TLS connection across sends, and its urllib3 Retry handles up to
+    3 attempts with exponential, 429-aware backoff.
+    """
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        _SESSION = requests.Session()
+        _SESSION.mount('https://', HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=4,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=2,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['POST'],
+            )
+        ))
+    return _SESSION
+
+class BufferedLogFileHandler(logging.Handler):
+    """
+    Collects formatted records in memory and writes them to the log file with a
+    single os.write() per flush, instead of one write (plus a rotation size check)
+    per record. Rotation by size is checked once per flush; logging.shutdown()
+    flushes the buffer at interpreter exit.
+    """
+    def __init__(self, filename, max_bytes=5*1024*1024, backup_count=5):
+        super().__init__()
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._buffer = []
+
+    def emit(self, record):
+        try:
+            self._buffer.append((self.format(record) + '\n').encode('utf-8', 'replace'))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            if not self._buffer:
+                return
+            data = b''.join(self._buffer)
+            self._buffer.clear()
+            try:
+                self._rotate_if_needed(len(data))
+                fd = os.open(self.filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass  # Logging must never take the notifier down
+
+    def _rotate_if_needed(self, incoming_bytes):
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            return
+        if size + incoming_bytes <= self.max_bytes:
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            rollover_file = f"{self.filename}.{i}"
+            if os.path.exists(rollover_file):
+                os.replace(rollover_file, f"{self.filename}.{i + 1}")
+        os.replace(self.filename, self.filename + ".1")
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            super().close()
+
 # Set up logging
 log_filename = 'log2telegram.log'
 logger = logging.getLogger('log2telegram.py')
 logger.setLevel(logging.DEBUG)
-handler = RotatingFileHandler(log_filename, maxBytes=5*1024*1024, backupCount=5)
+handler = BufferedLogFileHandler(log_filename, max_bytes=5*1024*1024, backup_count=5)
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
 logger.addHandler(handler)
@@ -57,42 +145,102 @@ def setup_console_logging(verbose: bool):
         logger.addHandler(console_handler)
         logger.debug("Console logging enabled.")
 
-# Compile regex for FINAL_STATUS detection anywhere in the message
-FINAL_STATUS_PATTERN = re.compile(r'FINAL_STATUS\s*\|', re.IGNORECASE)
+# Compile a single bytes regex that matches and captures a complete FINAL_STATUS
+# entry, so the mapped log tail can be scanned in one pass by the regex engine
+# without splitting or decoding non-matching lines.
+FINAL_STATUS_BYTES = re.compile(
+    rb'FINAL_STATUS\s*\|\s*(\w+)\s*\|\s*Script:\s*([^|\r\n]+?)\s*\|\s*Host:\s*([^|\r\n]+?)'
+    rb'\s*\|\s*Backup:\s*([^|\r\n]+?)\s*\|\s*Timestamp:\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})',
+    re.IGNORECASE
+)
 
-def send_telegram_message(message, retries=3, delay_between_retries=5):
+class LogState:
     """
-    Sends the given message to Telegram with a retry mechanism.
+    Persists the inode and read position of the log file between runs, so each run
+    only has to scan the bytes that were appended since the previous run.
     """
-    formatted_message = format_message(message)
-    logger.debug(f"Formatted message to send: {formatted_message}")
-    for attempt in range(1, retries + 1):
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.inode = None
+        self.position = 0
+        self.load_state()
+
+    # The state is two unsigned 64-bit integers (inode, position), 16 bytes total.
+    _STATE_FORMAT = '<QQ'
+    _STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            logger.info("No state file found at '%s'; starting from the beginning of the log.", self.state_file)
+            return
         try:
-            payload = {
-                "chat_id": TELEGRAM_CHAT_ID,
-                "text": formatted_message,
-                "parse_mode": "Markdown"  # Using Markdown for better formatting
-            }
-            response = requests.post(TELEGRAM_API_URL, data=payload, timeout=10)
-            logger.debug(f"Telegram API response: {response.status_code} - {response.text}")
-            if response.status_code == 200:
-                logger.info(f"Sent Telegram message: {formatted_message}")
-                return True
+            if len(data) == self._STATE_SIZE:
+                self.inode, self.position = struct.unpack(self._STATE_FORMAT, data)
             else:
-                logger.error(f"Failed to send Telegram message: {response.text}")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Exception occurred while sending Telegram message: {e}")
-        if attempt < retries:
-            logger.info(f"Retrying in {delay_between_retries} seconds... (Attempt {attempt}/{retries})")
-            time.sleep(delay_between_retries)
-    logger.error(f"Failed to send Telegram message after {retries} attempts.")
+                # Fall back to the JSON layout written by older versions
+                state = json.loads(data)
+                self.inode = state.get("inode")
+                self.position = state.get("position", 0)
+            logger.debug("Loaded state: inode=%s, position=%s", self.inode, self.position)
+        except Exception as e:
+            logger.warning("Could not read state file '%s': %s. Starting from the beginning.", self.state_file, e)
+            self.inode = None
+            self.position = 0
+
+    def save_state(self, inode, position):
+        try:
+            # Write to a temp file and atomically swap it in, so a crash mid-write
+            # cannot leave a truncated state file behind.
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(struct.pack(self._STATE_FORMAT, inode, position))
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.state_file)
+            self.inode = inode
+            self.position = position
+            logger.debug("Saved state: inode=%s, position=%s", inode, position)
+        except Exception as e:
+            logger.error("Could not write state file '%s': %s", self.state_file, e)
+
+def send_telegram_message(formatted_message):
+    """
+    Sends the given, already formatted message text to Telegram. Retries with
+    exponential backoff are handled by the session's urllib3 Retry configuration.
+    """
+    logger.debug("Formatted message to send: %s", formatted_message)
+    payload = {
+        "chat_id": TELEGRAM_CHAT_ID,
+        "text": formatted_message,
+        "parse_mode": "Markdown"  # Using Markdown for better formatting
+    }
+    try:
+        response = _get_session().post(TELEGRAM_API_URL, json=payload, timeout=10)
+        logger.debug("Telegram API response: %s - %s", response.status_code, response.text)
+        if response.status_code == 200:
+            logger.info("Sent Telegram message: %s", formatted_message)
+            return True
+        logger.error("Failed to send Telegram message: %s", response.text)
+    except OSError as e:  # requests exceptions derive from OSError
+        logger.error("Exception occurred while sending Telegram message: %s", e)
     return False
 
-def format_message(raw_message):
+# Message layout for Telegram, filled in with the five captured FINAL_STATUS fields
+_MESSAGE_TEMPLATE = (
+    "*FINAL_STATUS*\n"
+    "*Status:* `{}`\n"
+    "*Script:* `{}`\n"
+    "*Host:* `{}`\n"
+    "*Backup:* `{}`\n"
+    "*Timestamp:* `{}`"
+)
+
+def format_message(entry):
     """
-    Formats the raw FINAL_STATUS log entry into a Markdown message for Telegram.
-    Example Input:
-        FINAL_STATUS | SUCCESS | Script: rclone_backup_to_onedrive.py | Host: pistar | Backup: daily-pistar-20241203184347.tar.gz | Timestamp: 2024-12-03 18:43:58
+    Formats a FINAL_STATUS entry, captured as a (status, script, host, backup,
+    timestamp) tuple, into a Markdown message for Telegram.
     Example Output:
         *FINAL_STATUS*
         *Status:* `SUCCESS`
@@ -101,106 +249,228 @@ def format_message(raw_message):
         *Backup:* `daily-pistar-20241203184347.tar.gz`
         *Timestamp:* `2024-12-03 18:43:58`
     """
-    parts = raw_message.split(" | ")
-    if len(parts) != 6:
-        logger.warning(f"Unexpected FINAL_STATUS format: {raw_message}")
-        return raw_message  # Return as-is if format is unexpected
-
-    # Unpack the parts
-    _, status, script_info, host_info, backup_info, timestamp_info = parts
-
-    # Extract values after the colon and space
-    script_name = script_info.split(":", 1)[1].strip() if ":" in script_info else script_info
-    host = host_info.split(":", 1)[1].strip() if ":" in host_info else host_info
-    backup = backup_info.split(":", 1)[1].strip() if ":" in backup_info else backup_info
-    timestamp = timestamp_info.split(":", 1)[1].strip() if ":" in timestamp_info else timestamp_info
-
-    formatted_message = (
-        f"*FINAL_STATUS*\n"
-        f"*Status:* `{status}`\n"
-        f"*Script:* `{script_name}`\n"
-        f"*Host:* `{host}`\n"
-        f"*Backup:* `{backup}`\n"
-        f"*Timestamp:* `{timestamp}`"
-    )
-    return formatted_message
+    return _MESSAGE_TEMPLATE.format(*entry)
 
-def process_log():
+def scan_latest_entry_backward(f, size):
     """
-    Reads the entire log file from start to finish, looking for FINAL_STATUS entries.
-    Only the one with the most recent (largest) timestamp is sent to Telegram.
+    Scans the log file backward from EOF in fixed-size blocks and returns the newest
+    FINAL_STATUS entry, or None if there is none. Because the log is append-only,
+    the last entry in the file is the newest one, so the scan usually stops after a
+    single block regardless of how large the log is.
     """
-    if not os.path.exists(LOG_FILE_PATH):
-        logger.error(f"Log file '{LOG_FILE_PATH}' does not exist.")
-        return
+    block_size = 65536
+    pos = size
+    tail = b''
+    while pos > 0:
+        read = min(block_size, pos)
+        pos -= read
+        # pread reads at an absolute offset, saving the lseek syscall per block
+        chunk = os.pread(f.fileno(), read, pos) + tail
+        idx = chunk.rfind(b"FINAL_STATUS")
+        while idx != -1:
+            nl = chunk.find(b"\n", idx)
+            match = FINAL_STATUS_BYTES.match(chunk[idx:nl if nl != -1 else None])
+            if match:
+                return tuple(g.decode("utf-8", "replace").strip() for g in match.groups())
+            idx = chunk.rfind(b"FINAL_STATUS", 0, idx)
+        # Carry an overlap longer than any FINAL_STATUS line (~160 bytes plus
+        # generous headroom): an entry straddling the block boundary must stay
+        # intact through its Timestamp field or the regex cannot match it and
+        # a stale older entry would be returned instead.
+        tail = chunk[:512]
+    return None
 
+def scan_new_entries(state):
+    """
+    Maps the unread tail of the log file into memory and returns the FINAL_STATUS
+    entries found in it, updating the state to the new end of file.
+    Only the appended region [state.position, file size) is mapped, so the cost is
+    proportional to new data rather than to the size of the whole log.
+    """
+    entries = []
     try:
-        with open(LOG_FILE_PATH, 'r') as f:
-            lines = f.readlines()
-            if not lines:
-                logger.info("No lines found in the log file.")
-                return
-
-            logger.info(f"Read {len(lines)} line(s) from the log file.")
+        f = open(LOG_FILE_PATH, 'rb')
+    except FileNotFoundError:
+        logger.error("Log file '%s' does not exist.", LOG_FILE_PATH)
+        return entries
 
-            latest_dt = None
-            latest_message = None
+    try:
+        with f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
 
-            for line_number, line in enumerate(lines, start=1):
-                original_line = line  # Keep the original line for debugging
-                line = line.strip()
+            # On the very first run there is no prior state at all; after a
+            # rotation or truncation there is, and every byte of the current
+            # file is unseen. The two cases report differently below.
+            first_run = state.inode is None
+            if st.st_ino != state.inode or size < state.position:
+                if not first_run:
+                    logger.info("Log file was rotated or truncated; scanning from the beginning.")
+                state.position = 0
 
-                # Split the log line into components: [timestamp, script, level, message]
-                split_line = line.split(" - ", 3)
-                if len(split_line) < 4:
-                    logger.warning(f"Malformed log line (less than 4 parts): {original_line.strip()}")
-                    continue
+            if size == state.position:
+                logger.info("No new data in the log file.")
+                # Only rewrite the state file if something actually changed (e.g.
+                # the inode after a rotation to an identically-sized file); idle
+                # cron runs then cost no write at all.
+                if st.st_ino != state.inode:
+                    state.save_state(st.st_ino, size)
+                return entries
 
-                message_part = split_line[3].strip()
+            if first_run:
+                # No prior state: rather than replaying every historical
+                # entry, reverse-scan from EOF and report only the newest one.
+                # A rotated file deliberately does not take this path — all of
+                # its entries are new and must be reported, so it falls through
+                # to the forward scan from offset 0.
+                entry = scan_latest_entry_backward(f, size)
+                if entry is not None:
+                    entries.append(entry)
+                state.save_state(st.st_ino, size)
+                return entries
 
-                if FINAL_STATUS_PATTERN.search(message_part):
-                    # Attempt to parse "Timestamp: YYYY-MM-DD HH:MM:SS"
-                    match = re.search(r"Timestamp:\s*([\d\-:\s]+)", message_part)
+            # mmap offsets must be page aligned; map from the aligned offset below
+            # the saved position and start scanning at the saved position itself.
+            pa_offset = state.position & ~(mmap.ALLOCATIONGRANULARITY - 1)
+            delta = state.position - pa_offset
+            mm = mmap.mmap(f.fileno(), size - pa_offset, prot=mmap.PROT_READ, offset=pa_offset)
+            try:
+                if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                # Two-phase scan: locate candidate entries with bytes.find (a
+                # SIMD-accelerated C loop), then run the structured regex only
+                # on each hit instead of over the whole mapped region.
+                end = size - pa_offset
+                i = delta
+                while (j := mm.find(b"FINAL_STATUS", i)) != -1:
+                    line_end = mm.find(b"\n", j)
+                    if line_end == -1:
+                        line_end = end
+                    match = FINAL_STATUS_BYTES.match(mm[j:line_end])
                     if match:
-                        timestamp_str = match.group(1).strip()
-                        try:
-                            dt_value = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                            if latest_dt is None or dt_value > latest_dt:
-                                latest_dt = dt_value
-                                latest_message = message_part
-                            logger.debug(f"Line {line_number}: Found FINAL_STATUS with timestamp {timestamp_str}")
-                        except ValueError:
-                            logger.warning(f"Could not parse timestamp: {timestamp_str}")
-                    else:
-                        logger.debug(f"Line {line_number}: FINAL_STATUS found but no timestamp to compare.")
-                else:
-                    logger.debug(f"Line {line_number}: No FINAL_STATUS entry found.")
-                    logger.debug(f"Processed Line {line_number}: {message_part}")
-
-            if latest_message:
-                logger.info("Sending only the single newest FINAL_STATUS entry.")
-                send_telegram_message(latest_message)
-            else:
-                logger.info("No FINAL_STATUS entries found to send.")
+                        fields = tuple(g.decode("utf-8", "replace").strip() for g in match.groups())
+                        logger.debug("Found FINAL_STATUS entry: %s", fields)
+                        entries.append(fields)
+                    i = line_end + 1
+            finally:
+                mm.close()
+
+            state.save_state(st.st_ino, size)
 
     except Exception as e:
-        logger.error(f"Error reading or processing log file: {e}")
+        logger.error("Error reading or processing log file: %s", e)
+
+    return entries
+
+# Telegram caps sendMessage at 4096 characters; stay safely below that when
+# concatenating several FINAL_STATUS entries into one message.
+_MAX_MESSAGE_CHARS = 3900
+_ENTRY_SEPARATOR = "\n\n---\n\n"
+
+def batch_messages(entries):
+    """
+    Formats the given FINAL_STATUS entries and concatenates them into as few
+    Telegram messages as possible, each at most _MAX_MESSAGE_CHARS characters.
+    """
+    chunks = []
+    current = []
+    current_len = 0
+    for entry in entries:
+        formatted = format_message(entry)
+        added = len(formatted) + (len(_ENTRY_SEPARATOR) if current else 0)
+        if current and current_len + added > _MAX_MESSAGE_CHARS:
+            chunks.append(_ENTRY_SEPARATOR.join(current))
+            current = []
+            current_len = 0
+            added = len(formatted)
+        current.append(formatted)
+        current_len += added
+    if current:
+        chunks.append(_ENTRY_SEPARATOR.join(current))
+    return chunks
+
+def process_log(state, delay):
+    """
+    Scans the log file for new FINAL_STATUS entries and sends them to Telegram,
+    batching as many entries as fit into each message. Usually a single message
+    suffices; `delay` seconds are only slept between additional messages.
+    """
+    entries = scan_new_entries(state)
+    if not entries:
+        logger.info("No new FINAL_STATUS entries found to send.")
+        return
+
+    chunks = batch_messages(entries)
+    logger.info("Sending %d new FINAL_STATUS entry(ies) in %d message(s).", len(entries), len(chunks))
+    for idx, chunk in enumerate(chunks):
+        send_telegram_message(chunk)
+        if idx < len(chunks) - 1:
+            time.sleep(delay)
+    # Persist what this pass logged, so watch mode does not hold records forever
+    handler.flush()
+
+def poll_log(state, delay, interval):
+    """
+    Polling fallback for the watch mode: re-scans the log every `interval` seconds.
+    """
+    logger.info("Polling '%s' every %s second(s).", LOG_FILE_PATH, interval)
+    while True:
+        time.sleep(interval)
+        process_log(state, delay)
+
+def watch_log(state, delay, poll_interval=None):
+    """
+    Runs as a long-lived process, re-scanning the log whenever it changes instead of
+    waiting for the next cron tick. Uses inotify (via the optional 'watchfiles'
+    package) so notifications go out within milliseconds of the log being written;
+    falls back to polling when watchfiles is unavailable or --poll is given (e.g. on
+    NFS/CIFS mounts where inotify is unreliable).
+    """
+    # Drain whatever is already in the log before waiting for changes
+    process_log(state, delay)
+
+    if poll_interval:
+        poll_log(state, delay, poll_interval)
+        return
+
+    try:
+        from watchfiles import watch, Change
+    except ImportError:
+        logger.warning("The 'watchfiles' package is not installed; falling back to polling every 10 seconds.")
+        poll_log(state, delay, 10)
+        return
+
+    logger.info("Watching '%s' for changes.", LOG_FILE_PATH)
+    for changes in watch(LOG_FILE_PATH):
+        if any(change in (Change.modified, Change.added) for change, _ in changes):
+            process_log(state, delay)
 
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(
-        description="Reads 'rclone_backup_to_onedrive.log' for FINAL_STATUS entries, sending only the most recent one to Telegram."
+        description="Reads 'rclone_backup_to_onedrive.log' for new FINAL_STATUS entries and sends them to Telegram."
     )
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output to the console.')
     parser.add_argument('-d', '--delay', type=int, default=10,
-                        help='Delay in seconds between sending multiple Telegram messages (if needed). Not crucial since only one message is sent.')
+                        help='Delay in seconds between sending multiple Telegram messages.')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='Keep running and send new FINAL_STATUS entries as soon as the log changes.')
+    parser.add_argument('--poll', type=int, metavar='SECONDS', default=None,
+                        help='With --watch: poll the log at this interval instead of using inotify (for NFS/CIFS).')
     args = parser.parse_args()
 
     # Set up console logging if verbose is enabled
     setup_console_logging(args.verbose)
 
-    # Process the entire log file (always from the beginning)
-    process_log()
+    # Process only what was appended to the log since the last run
+    state = LogState(STATE_FILE_PATH)
+    if args.watch:
+        try:
+            watch_log(state, args.delay, args.poll)
+        except KeyboardInterrupt:
+            logger.info("Watch mode interrupted; exiting.")
+    else:
+        process_log(state, args.delay)
 
 if __name__ == "__main__":
     main()